@@ -1,10 +1,11 @@
 """Quick script to add a test user for testing."""
-from app.database import SessionLocal, engine, Base
+from app.database import SessionLocal, engine
+from app.migrations import ensure_schema
 from app.models import User
 from app.auth import hash_password
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Create tables if the schema is not up to date
+ensure_schema(engine)
 
 # Create session
 db = SessionLocal()
@@ -1,2 +1,5 @@
 # App package
+import time
 
+# Recorded when the package is first imported, for the startup timing report
+STARTED_AT = time.perf_counter()
@@ -0,0 +1,293 @@
+"""
+Append-only audit log for logins and status changes.
+
+Request handlers call `audit_log.record(...)`, which only puts the event on
+a bounded in-memory queue. A background thread drains the queue and writes
+events in batches to a sink:
+
+- DatabaseAuditSink: batched inserts into the `audit_events` table.
+- SegmentFileAuditSink: rotating append-only NDJSON segment files,
+  queried through memory-mapping.
+
+When the queue is full, `record` blocks the calling worker for up to
+AUDIT_BACKPRESSURE_SECONDS before giving up on the event.
+"""
+import json
+import logging
+import mmap
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.database import ReadSessionLocal, write_engine
+from app.models import AuditEvent
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class DatabaseAuditSink:
+    """Writes audit events to the audit_events table."""
+
+    def write_batch(self, events: List[dict]) -> None:
+        rows = [
+            {**event, "detail": json.dumps(event["detail"]) if event["detail"] else None}
+            for event in events
+        ]
+        with write_engine.begin() as conn:
+            conn.execute(insert(AuditEvent), rows)
+
+    def query(
+        self,
+        username: Optional[str] = None,
+        event: Optional[str] = None,
+        since: Optional[datetime] = None,
+        limit: int = 100,
+    ) -> List[dict]:
+        db = ReadSessionLocal()
+        try:
+            query = db.query(AuditEvent)
+            if username:
+                query = query.filter(AuditEvent.username == username)
+            if event:
+                query = query.filter(AuditEvent.event == event)
+            if since:
+                query = query.filter(AuditEvent.created_at >= since)
+            rows = query.order_by(AuditEvent.created_at.desc(), AuditEvent.id.desc()).limit(limit).all()
+            return [
+                {
+                    "created_at": row.created_at,
+                    "event": row.event,
+                    "username": row.username,
+                    "client_ip": row.client_ip,
+                    "detail": json.loads(row.detail) if row.detail else {},
+                }
+                for row in rows
+            ]
+        finally:
+            db.close()
+
+
+class SegmentFileAuditSink:
+    """
+    Writes audit events as NDJSON to append-only segment files.
+
+    Segments are named audit-000001.ndjson, audit-000002.ndjson, ...
+    and a new one is started once the current segment would exceed
+    `max_segment_bytes`. Existing segments are never modified.
+    """
+
+    def __init__(self, directory: str, max_segment_bytes: int):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        # Reopen at the last segment, unless it ends in a partly written line
+        # (e.g. after a crash), in which case start a new one after it
+        segments = self._segments()
+        self._sequence = int(segments[-1][6:12]) if segments else 1
+        self._size = os.path.getsize(self._path(self._sequence)) if segments else 0
+        if self._size and not self._ends_with_newline(self._path(self._sequence)):
+            self._sequence += 1
+            self._size = 0
+
+    def _segments(self) -> List[str]:
+        return sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith("audit-") and name.endswith(".ndjson")
+        )
+
+    @staticmethod
+    def _ends_with_newline(path: str) -> bool:
+        with open(path, "rb") as segment:
+            segment.seek(-1, os.SEEK_END)
+            return segment.read(1) == b"\n"
+
+    def _path(self, sequence: int) -> str:
+        return os.path.join(self.directory, f"audit-{sequence:06d}.ndjson")
+
+    def write_batch(self, events: List[dict]) -> None:
+        data = "".join(
+            json.dumps({**event, "created_at": event["created_at"].isoformat()}) + "\n"
+            for event in events
+        ).encode()
+
+        if self._size and self._size + len(data) > self.max_segment_bytes:
+            self._sequence += 1
+            self._size = 0
+
+        with open(self._path(self._sequence), "ab") as segment:
+            segment.write(data)
+            segment.flush()
+            os.fsync(segment.fileno())
+        self._size += len(data)
+
+    def query(
+        self,
+        username: Optional[str] = None,
+        event: Optional[str] = None,
+        since: Optional[datetime] = None,
+        limit: int = 100,
+    ) -> List[dict]:
+        # Events are written as {"created_at": ..., "event": ..., "username": ...},
+        # so a username filter can jump straight to matching lines with mmap.find
+        needle = f'"username": {json.dumps(username)}'.encode() if username else None
+        results = []
+
+        for name in reversed(self._segments()):
+            matches = []
+            reached_since = False
+            for line in self._read_lines(os.path.join(self.directory, name), needle):
+                record = json.loads(line)
+                record["created_at"] = datetime.fromisoformat(record["created_at"])
+                if since and record["created_at"] < since:
+                    reached_since = True
+                    continue
+                if event and record["event"] != event:
+                    continue
+                matches.append(record)
+
+            # Newest first within each segment, then across segments
+            results.extend(reversed(matches))
+            # Segments are written in time order, so older ones can't match `since`
+            if len(results) >= limit or reached_since:
+                break
+
+        return results[:limit]
+
+    @staticmethod
+    def _read_lines(path: str, needle: Optional[bytes]):
+        """Yield complete lines from a segment, only those containing `needle` if given."""
+        if os.path.getsize(path) == 0:
+            return
+        with open(path, "rb") as segment, mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if needle is None:
+                for line in iter(mm.readline, b""):
+                    if line.endswith(b"\n"):
+                        yield line
+                return
+
+            position = mm.find(needle)
+            while position != -1:
+                start = mm.rfind(b"\n", 0, position) + 1
+                end = mm.find(b"\n", position)
+                if end == -1:
+                    # Partially written last line
+                    return
+                yield mm[start:end]
+                position = mm.find(needle, end)
+
+
+class AuditLog:
+    """
+    Bounded queue of audit events drained by a background writer thread.
+    Events are written in batches of up to `batch_size`, at most
+    `flush_interval` seconds after the first event of a batch arrives.
+    """
+
+    def __init__(self, queue_size: int, batch_size: int, flush_interval: float, backpressure_seconds: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backpressure_seconds = backpressure_seconds
+        self.dropped = 0
+        self.sink = None
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=queue_size)
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _entry(event: str, username: str, client_ip: Optional[str], detail: dict) -> dict:
+        return {
+            "created_at": datetime.utcnow(),
+            "event": event,
+            # Login attempts can carry arbitrary usernames; keep within the column size
+            "username": username[:50],
+            "client_ip": client_ip,
+            "detail": detail,
+        }
+
+    def record(self, event: str, username: str, client_ip: Optional[str] = None, **detail) -> None:
+        """Queue an audit event. Returns immediately unless the queue is full."""
+        entry = self._entry(event, username, client_ip, detail)
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            try:
+                self._queue.put(entry, timeout=self.backpressure_seconds)
+            except queue.Full:
+                self.dropped += 1
+                logger.error("Audit queue full, dropped %s event for %s", event, username)
+
+    def record_blocking(self, event: str, username: str, client_ip: Optional[str] = None, **detail) -> None:
+        """
+        Queue an audit event, waiting as long as needed for space.
+        For batch jobs, where throughput matters more than latency and
+        dropping events is not acceptable.
+        """
+        if self._thread is None:
+            # Nothing is draining the queue, so waiting could block forever
+            self.record(event, username, client_ip, **detail)
+            return
+        self._queue.put(self._entry(event, username, client_ip, detail))
+
+    def start(self, sink) -> None:
+        """Start the background writer."""
+        self.sink = sink
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush everything still queued and stop the writer."""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch:
+                try:
+                    self.sink.write_batch(batch)
+                except Exception:
+                    logger.exception("Failed to write %d audit events", len(batch))
+            elif self._stopping.is_set():
+                return
+
+    def _next_batch(self) -> List[dict]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if self._stopping.is_set():
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+
+def make_sink():
+    """Build the sink selected by AUDIT_SINK ("database" or "files")."""
+    if settings.AUDIT_SINK == "files":
+        return SegmentFileAuditSink(settings.AUDIT_DIR, settings.AUDIT_SEGMENT_MAX_BYTES)
+    return DatabaseAuditSink()
+
+
+audit_log = AuditLog(
+    queue_size=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+    backpressure_seconds=settings.AUDIT_BACKPRESSURE_SECONDS,
+)
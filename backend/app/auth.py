@@ -1,17 +1,25 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models import User
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    """
+    Password hashing context.
+    passlib/bcrypt are imported on first use to keep startup fast.
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
 
 # OAuth2 scheme for token extraction from Authorization header
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
@@ -19,30 +27,37 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
 def hash_password(password: str) -> str:
     """Hash a plain text password."""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain text password against a hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+
+@lru_cache(maxsize=1)
+def get_dummy_hash() -> str:
+    """
+    Hash verified against when the username does not exist,
+    so unknown users cost the same as a wrong password.
+    """
+    return get_pwd_context().hash("dummy-password-for-timing")
 
 
 def create_access_token(data: dict) -> str:
     """Create a JWT access token."""
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """
-    Dependency that extracts and validates the JWT token,
-    then returns the current user.
-    """
+def _user_from_token(token: str, db: Session) -> User:
+    """Validate the JWT token and look up its user through `db`."""
+    from jose import JWTError, jwt
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -63,3 +78,37 @@ def get_current_user(
     
     return user
 
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> User:
+    """
+    Dependency that extracts and validates the JWT token,
+    then returns the current user.
+    Looks the user up through the writer, for routes that modify them.
+    """
+    return _user_from_token(token, db)
+
+
+def get_current_user_read(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_read_db)
+) -> User:
+    """
+    Same as get_current_user, but looks the user up through the read
+    engine, so read-only routes never take a writer connection.
+    """
+    return _user_from_token(token, db)
+
+
+def require_admin(current_user: User = Depends(get_current_user_read)) -> User:
+    """
+    Dependency that only lets users listed in ADMIN_USERNAMES through.
+    """
+    if current_user.username not in settings.ADMIN_USERNAMES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    return current_user
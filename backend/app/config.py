@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -5,10 +7,43 @@ class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
     
     DATABASE_URL: str = "sqlite:///./team_presence.db"
+    # Optional separate database (e.g. a Postgres replica) for read traffic
+    READ_DATABASE_URL: Optional[str] = None
+    WRITE_POOL_SIZE: int = 5
+    READ_POOL_SIZE: int = 10
+    # How long a user's reads stick to the writer after they update something
+    READ_YOUR_WRITES_SECONDS: float = 5
+    READ_YOUR_WRITES_MAX_KEYS: int = 10000
+    # How often the in-memory presence index reloads to pick up writes from other processes
+    PRESENCE_REFRESH_SECONDS: float = 60
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Login throttling (token buckets per username and per client IP)
+    LOGIN_USER_RATE_PER_MINUTE: float = 5
+    LOGIN_USER_BURST: int = 5
+    LOGIN_IP_RATE_PER_MINUTE: float = 50
+    LOGIN_IP_BURST: int = 50
+    LOGIN_LIMITER_MAX_KEYS: int = 10000
+    # Maximum concurrent password verifications before shedding load
+    LOGIN_MAX_CONCURRENCY: int = 4
+
+    # Audit log: "database" (audit_events table) or "files" (NDJSON segments in AUDIT_DIR)
+    AUDIT_SINK: str = "database"
+    AUDIT_DIR: str = "./audit"
+    AUDIT_SEGMENT_MAX_BYTES: int = 64 * 1024 * 1024
+    AUDIT_QUEUE_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 1.0
+    AUDIT_BACKPRESSURE_SECONDS: float = 0.05
+
+    # Usernames allowed to use admin endpoints (GET /audit, POST /ingest/statuses)
+    ADMIN_USERNAMES: List[str] = []
+
+    # Bulk status feed ingestion: users updated per transaction
+    INGEST_CHUNK_SIZE: int = 1000
+
     class Config:
         env_file = ".env"
 
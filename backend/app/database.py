@@ -1,22 +1,131 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import StaticPool
 
 from app.config import settings
 
-# Create SQLite engine
-# check_same_thread=False is needed for SQLite with FastAPI
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
 
-# Session factory for database sessions
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _is_sqlite_memory(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def make_engine(database_url: str, pool_size: int, read_only: bool = False):
+    """
+    Create an engine with its own connection pool.
+
+    SQLite files are switched to WAL so readers don't block the writer.
+    On SQLite and Postgres, read-only engines refuse writes at the
+    connection level (PRAGMA query_only / read-only transactions).
+    """
+    url = make_url(database_url)
+
+    if url.get_backend_name() != "sqlite":
+        execution_options = {}
+        if read_only and url.get_backend_name() == "postgresql":
+            execution_options["postgresql_readonly"] = True
+        return create_engine(
+            url,
+            pool_size=pool_size,
+            max_overflow=pool_size,
+            pool_pre_ping=True,
+            execution_options=execution_options,
+        )
+
+    # check_same_thread=False is needed for SQLite with FastAPI
+    connect_args = {"check_same_thread": False}
+    if _is_sqlite_memory(url):
+        # One shared connection, so every thread sees the same database
+        return create_engine(url, connect_args=connect_args, poolclass=StaticPool)
+
+    sqlite_engine = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=pool_size,
+        max_overflow=pool_size,
+    )
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        else:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return sqlite_engine
+
+
+# Writer handles all mutations (and auth lookups, so the user can be updated)
+write_engine = make_engine(settings.DATABASE_URL, settings.WRITE_POOL_SIZE)
+
+# Reader serves heavy read traffic; defaults to a separate pool on the same database
+_read_url = settings.READ_DATABASE_URL or settings.DATABASE_URL
+if _is_sqlite_memory(make_url(_read_url)):
+    # An in-memory database only exists inside its own engine
+    read_engine = write_engine
+else:
+    read_engine = make_engine(_read_url, settings.READ_POOL_SIZE, read_only=True)
+
+# Kept for scripts that only need a single engine
+engine = write_engine
+
+# Session factories for database sessions
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=write_engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 # Base class for all models
 Base = declarative_base()
 
 
+class RecentWriters:
+    """
+    Remembers who wrote recently so their reads can stick to the writer.
+
+    With a replicated reader, a user who just updated their status could
+    otherwise read stale data. Bounded to `max_keys` entries, dropping the
+    oldest first.
+    """
+
+    def __init__(self, window_seconds: float, max_keys: int):
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        # key -> expiry timestamp
+        self._expiry: "OrderedDict[object, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mark(self, key) -> None:
+        """Record a write by `key`."""
+        with self._lock:
+            self._expiry.pop(key, None)
+            self._expiry[key] = time.monotonic() + self.window_seconds
+            while len(self._expiry) > self.max_keys:
+                self._expiry.popitem(last=False)
+
+    def is_recent(self, key) -> bool:
+        """Whether `key` wrote within the stickiness window."""
+        with self._lock:
+            expiry = self._expiry.get(key)
+            if expiry is None:
+                return False
+            if expiry <= time.monotonic():
+                del self._expiry[key]
+                return False
+            return True
+
+
+recent_writers = RecentWriters(
+    window_seconds=settings.READ_YOUR_WRITES_SECONDS,
+    max_keys=settings.READ_YOUR_WRITES_MAX_KEYS,
+)
+
+
 def get_db():
     """
     Dependency that provides a database session.
@@ -28,3 +137,14 @@ def get_db():
     finally:
         db.close()
 
+
+def get_read_db():
+    """
+    Dependency that provides a session bound to the read engine.
+    Use for read-only queries; mutations must go through get_db.
+    """
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
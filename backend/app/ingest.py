@@ -0,0 +1,283 @@
+"""
+Bulk status ingestion from HR / calendar feeds.
+
+Feeds are read line by line, so memory stays bounded by the user index
+and one chunk of pending changes (plus, for ICS, the set of attendees),
+not by the size of the feed:
+
+- CSV: a header row with `username` (or `email`) and `status` columns.
+  Status may be the number, the enum name (ON_VACATION) or the label
+  (On Vacation).
+- ICS: VEVENTs active at ingestion time set the status of each ATTENDEE
+  (matched by the local part of their mailto: address), based on the
+  event's CATEGORIES. Attendees of status events that have ended, and
+  who have no active event in the feed, are set back to WORKING.
+
+Only users whose status actually changes are written, in transactions of
+INGEST_CHUNK_SIZE users. Malformed CSV rows and events with unparseable
+dates are counted as invalid rows rather than failing the feed.
+"""
+import csv
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from sqlalchemy import select, update
+
+from app.audit import audit_log
+from app.config import settings
+from app.database import SessionLocal
+from app.models import User
+from app.presence import presence_index
+from app.schemas import IngestReport, StatusEnum, STATUS_LABELS
+
+# Every accepted spelling of a status, normalized to lower case
+STATUS_ALIASES: Dict[str, StatusEnum] = {}
+for _status in StatusEnum:
+    STATUS_ALIASES[str(_status.value)] = _status
+    STATUS_ALIASES[_status.name.lower()] = _status
+    STATUS_ALIASES[STATUS_LABELS[_status].lower()] = _status
+
+# ICS CATEGORIES values that imply a status
+ICS_CATEGORY_STATUSES: Dict[str, StatusEnum] = {
+    "vacation": StatusEnum.ON_VACATION,
+    "holiday": StatusEnum.ON_VACATION,
+    "pto": StatusEnum.ON_VACATION,
+    "out of office": StatusEnum.ON_VACATION,
+    "business trip": StatusEnum.BUSINESS_TRIP,
+    "travel": StatusEnum.BUSINESS_TRIP,
+    "remote": StatusEnum.WORKING_REMOTELY,
+    "working remotely": StatusEnum.WORKING_REMOTELY,
+    "wfh": StatusEnum.WORKING_REMOTELY,
+}
+
+# (username, status) pairs produced by the parsers; status is None if unrecognized
+FeedRow = Tuple[str, Optional[StatusEnum]]
+
+
+def _username_from(value: str) -> str:
+    """Normalize a username, email or mailto: URI to a lookup key."""
+    value = value.strip().lower()
+    if value.startswith("mailto:"):
+        value = value[len("mailto:"):]
+    return value.split("@", 1)[0]
+
+
+def parse_csv(stream: TextIO) -> Iterator[FeedRow]:
+    """Yield (username, status) rows from a CSV feed."""
+    reader = csv.DictReader(stream)
+    fields = {name.strip().lower(): name for name in reader.fieldnames or []}
+    user_field = fields.get("username") or fields.get("email")
+    status_field = fields.get("status")
+    if not user_field or not status_field:
+        raise ValueError("CSV feed needs a 'username' (or 'email') and a 'status' column")
+
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error:
+            # Malformed row (e.g. an oversized field); count it as invalid and move on
+            yield "", None
+            continue
+        username = _username_from(row[user_field] or "")
+        status = STATUS_ALIASES.get((row[status_field] or "").strip().lower())
+        yield username, status
+
+
+def _unfold(stream: TextIO) -> Iterator[str]:
+    """Join RFC 5545 folded lines (continuations start with a space or tab)."""
+    current = None
+    for raw in stream:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _parse_ics_time(value: str) -> datetime:
+    """Parse DATE or DATE-TIME values; times are treated as UTC."""
+    value = value.rstrip("Z")
+    if len(value) == 8:
+        return datetime.combine(datetime.strptime(value, "%Y%m%d").date(), datetime.min.time())
+    return datetime.strptime(value, "%Y%m%dT%H%M%S")
+
+
+_ICS_DURATION = re.compile(
+    r"\+?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?"
+)
+
+
+def _parse_ics_duration(value: str) -> timedelta:
+    """Parse a (non-negative) RFC 5545 DURATION such as P1D, PT8H or P1DT12H."""
+    match = _ICS_DURATION.fullmatch(value.strip())
+    if not match or not any(match.groupdict().values()):
+        raise ValueError(f"Invalid DURATION: {value}")
+    parts = {name: int(amount) for name, amount in match.groupdict().items() if amount}
+    return timedelta(**parts)
+
+
+def _event_end(event: dict) -> datetime:
+    """
+    DTEND if given, else DTSTART + DURATION. Without either, a DATE start
+    lasts one day and a DATE-TIME start lasts no time at all (RFC 5545).
+    """
+    if "end" in event:
+        return event["end"]
+    if "duration" in event:
+        return event["start"] + event["duration"]
+    return event["start"] + timedelta(days=1) if event["all_day"] else event["start"]
+
+
+def parse_ics(stream: TextIO, now: Optional[datetime] = None) -> Iterator[FeedRow]:
+    """
+    Yield (username, status) for each attendee of VEVENTs active at `now`,
+    then (username, WORKING) for attendees of ended status events who have
+    no active event.
+    """
+    now = now or datetime.utcnow()
+    event = None
+    active, ended = set(), set()
+
+    for line in _unfold(stream):
+        if line == "BEGIN:VEVENT":
+            event = {"attendees": [], "categories": [], "invalid": False, "all_day": False}
+            continue
+        if event is None:
+            continue
+        if line == "END:VEVENT":
+            if event["invalid"]:
+                # Unparseable dates: report the attendees as invalid rows instead of aborting the feed
+                for attendee in event["attendees"] or [""]:
+                    yield attendee, None
+            elif "start" in event and event["start"] <= now:
+                status = next(
+                    (ICS_CATEGORY_STATUSES[c] for c in event["categories"] if c in ICS_CATEGORY_STATUSES),
+                    None,
+                )
+                if now < _event_end(event):
+                    active.update(event["attendees"])
+                    for attendee in event["attendees"]:
+                        yield attendee, status
+                elif status is not None:
+                    ended.update(event["attendees"])
+            event = None
+            continue
+
+        name, _, value = line.partition(":")
+        name = name.split(";", 1)[0].upper()
+        if name in ("DTSTART", "DTEND", "DURATION"):
+            try:
+                if name == "DURATION":
+                    event["duration"] = _parse_ics_duration(value)
+                else:
+                    event["start" if name == "DTSTART" else "end"] = _parse_ics_time(value)
+            except ValueError:
+                event["invalid"] = True
+            if name == "DTSTART":
+                event["all_day"] = len(value.rstrip("Z")) == 8
+        elif name == "ATTENDEE":
+            event["attendees"].append(_username_from(value))
+        elif name == "CATEGORIES":
+            event["categories"].extend(c.strip().lower() for c in value.split(","))
+
+    # Whoever the feed put on vacation or a trip goes back to working once it's over
+    for attendee in sorted(ended - active):
+        yield attendee, StatusEnum.WORKING
+
+
+def load_user_index(db) -> Dict[str, List[int]]:
+    """Map username -> [id, status] for every user, without building ORM objects."""
+    rows = db.execute(select(User.id, User.username, User.status)).yield_per(10000)
+    return {username.lower(): [user_id, status] for user_id, username, status in rows}
+
+
+def _apply_chunk(db, pending: Dict[int, Tuple[str, int, int]]) -> None:
+    """Write one chunk of changes in a single transaction, then update the presence index and audit log."""
+    now = datetime.utcnow()
+    db.execute(
+        update(User),
+        [{"id": user_id, "status": new, "updated_at": now} for user_id, (_, _, new) in pending.items()],
+    )
+    db.commit()
+    for user_id, (username, previous, new) in pending.items():
+        presence_index.set_status(user_id, new, now)
+        audit_log.record_blocking("status_change", username, previous=previous, current=new, source="feed")
+
+
+def ingest_rows(rows: Iterable[FeedRow], chunk_size: Optional[int] = None) -> IngestReport:
+    """Diff feed rows against current statuses and write only the changes."""
+    chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+    report = IngestReport()
+    started = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        index = load_user_index(db)
+        # user id -> (username, previous status, new status)
+        pending: Dict[int, Tuple[str, int, int]] = {}
+
+        for username, status in rows:
+            report.rows += 1
+            if status is None:
+                report.invalid_rows += 1
+                continue
+            entry = index.get(username)
+            if entry is None:
+                report.unknown_users += 1
+                continue
+
+            user_id, current = entry
+            if current == status.value:
+                report.unchanged += 1
+                continue
+
+            entry[1] = status.value
+            if user_id in pending:
+                # The earlier row for this user in the chunk won't be written as such
+                report.unchanged += 1
+                previous = pending[user_id][1]
+            else:
+                previous = current
+            if status.value == previous:
+                # Changed back within the same chunk, nothing to write
+                report.unchanged += 1
+                del pending[user_id]
+                continue
+            pending[user_id] = (username, previous, status.value)
+
+            if len(pending) >= chunk_size:
+                _apply_chunk(db, pending)
+                report.changed += len(pending)
+                report.chunks += 1
+                pending = {}
+
+        if pending:
+            _apply_chunk(db, pending)
+            report.changed += len(pending)
+            report.chunks += 1
+    finally:
+        db.close()
+
+    report.seconds = time.perf_counter() - started
+    report.rows_per_second = report.rows / report.seconds if report.seconds else 0.0
+    return report
+
+
+def ingest_feed(stream: TextIO, feed_format: str, chunk_size: Optional[int] = None) -> IngestReport:
+    """Parse a CSV or ICS feed from `stream` and apply the status changes."""
+    if feed_format == "csv":
+        rows = parse_csv(stream)
+    elif feed_format == "ics":
+        rows = parse_ics(stream)
+    else:
+        raise ValueError(f"Unsupported feed format: {feed_format}")
+    return ingest_rows(rows, chunk_size)
@@ -1,20 +1,48 @@
+import logging
+import time
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.database import engine, Base
-from app.routes import auth, team
+from app import STARTED_AT
+from app.audit import audit_log, make_sink
+from app.database import engine
+from app.migrations import ensure_schema
+from app.routes import audit, auth, ingest, team
 
 # Import models so they're registered with Base
 from app import models  # noqa
 
+_imports_done = time.perf_counter()
+
+logger = logging.getLogger("uvicorn.error")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Create database tables on startup."""
-    Base.metadata.create_all(bind=engine)
+    """
+    Check the schema version and start the audit writer on startup,
+    logging a startup timing breakdown. Flushes the audit log on shutdown.
+    """
+    timings = {"imports": _imports_done - STARTED_AT}
+
+    phase_started = time.perf_counter()
+    version = ensure_schema(engine)
+    timings["schema"] = time.perf_counter() - phase_started
+
+    phase_started = time.perf_counter()
+    audit_log.start(make_sink())
+    timings["audit"] = time.perf_counter() - phase_started
+
+    timings["total"] = time.perf_counter() - STARTED_AT
+    logger.info(
+        "Startup timings (schema v%d): %s",
+        version,
+        ", ".join(f"{phase}={seconds * 1000:.1f}ms" for phase, seconds in timings.items()),
+    )
     yield
+    audit_log.stop()
 
 
 app = FastAPI(
@@ -36,6 +64,8 @@ app.add_middleware(
 # Include routers
 app.include_router(auth.router)
 app.include_router(team.router)
+app.include_router(audit.router)
+app.include_router(ingest.router)
 
 
 @app.get("/health")
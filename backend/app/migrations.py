@@ -0,0 +1,71 @@
+"""
+Versioned schema migrations.
+
+The database records its schema version in the `schema_version` table.
+On startup, `ensure_schema` reads that single row, and only applies the
+pending migrations when the stored version is behind `SCHEMA_VERSION`.
+An up-to-date database therefore costs one cheap SELECT per boot.
+"""
+from sqlalchemy import Column, Integer, MetaData, Table, select
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+# Kept out of the models' metadata so model tables and bookkeeping stay separate
+version_metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    version_metadata,
+    Column("version", Integer, nullable=False),
+)
+
+
+def _create_initial_tables(conn):
+    """Version 1: the original tables (safe on databases created before versioning)."""
+    from app.models import User
+
+    User.__table__.create(bind=conn, checkfirst=True)
+
+
+def _create_audit_events(conn):
+    """Version 2: append-only audit log table."""
+    from app.models import AuditEvent
+
+    AuditEvent.__table__.create(bind=conn, checkfirst=True)
+
+
+# Ordered list of migrations; MIGRATIONS[i] upgrades version i to i + 1
+MIGRATIONS = [
+    _create_initial_tables,
+    _create_audit_events,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(engine) -> int:
+    """Return the stored schema version, or 0 if the database is unversioned."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(schema_version.c.version)).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        # schema_version table doesn't exist yet
+        return 0
+
+
+def ensure_schema(engine) -> int:
+    """
+    Bring the database up to SCHEMA_VERSION.
+    Returns the schema version the database is at afterwards.
+    """
+    current = get_schema_version(engine)
+    if current >= SCHEMA_VERSION:
+        return current
+
+    with engine.begin() as conn:
+        version_metadata.create_all(bind=conn)
+        for migrate in MIGRATIONS[current:]:
+            migrate(conn)
+        conn.execute(schema_version.delete())
+        conn.execute(schema_version.insert().values(version=SCHEMA_VERSION))
+
+    return SCHEMA_VERSION
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 
 from app.database import Base
 
@@ -16,3 +16,19 @@ class User(Base):
     status = Column(Integer, nullable=False, default=0)  # 0=Working, 1=Working Remotely, 2=On Vacation, 3=Business Trip
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+
+class AuditEvent(Base):
+    """Append-only record of a login or status change."""
+
+    __tablename__ = "audit_events"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False, index=True)
+    event = Column(String(32), nullable=False)
+    username = Column(String(50), nullable=False)
+    client_ip = Column(String(45), nullable=True)
+    detail = Column(String(255), nullable=True)  # JSON-encoded extra fields
+
+    __table_args__ = (
+        Index("ix_audit_events_username_created_at", "username", "created_at"),
+    )
@@ -0,0 +1,231 @@
+"""
+In-memory presence index for GET /team and status counts.
+
+Users are stored in parallel arrays, one slot per user in full_name
+order, so every view comes out already sorted:
+
+- ids / updated_at: array('q'), 8 bytes per user each
+- statuses: bytearray, 1 byte per user
+- one bitset per status: bytearray, 1 bit per user
+- slot_by_id: array('l') mapping user id -> slot
+
+Filtering by several statuses is a union of their bitsets, and status
+counts are kept as counters, so they are O(1).
+
+The index is loaded lazily from the database and kept in sync by the
+writers in this process (update_my_status, feed ingestion). Writes made
+by other processes are picked up by a full reload every
+PRESENCE_REFRESH_SECONDS, which runs in a background thread while
+requests keep reading the current snapshot. Writes made during a load are
+replayed onto the new snapshot before it is swapped in.
+"""
+import logging
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import ReadSessionLocal
+from app.models import User
+from app.schemas import StatusEnum
+
+logger = logging.getLogger("uvicorn.error")
+
+EPOCH = datetime(1970, 1, 1)
+NO_SLOT = -1
+
+# For each byte value, the positions of its set bits
+_BIT_POSITIONS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+# (id, full_name, status, updated_at) rows returned by the index
+PresenceRow = Tuple[int, str, int, datetime]
+
+
+def _to_micros(value: datetime) -> int:
+    """Naive UTC datetime -> integer microseconds since the epoch (exact round trip)."""
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+class PresenceIndex:
+    """Compact, array-backed index of every user's status."""
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._has_snapshot = False
+        # (user_id, status, updated_at micros) written while a load is running
+        self._replay: Optional[List[Tuple[int, int, int]]] = None
+        self._ids = array("q")
+        self._names: List[str] = []
+        self._statuses = bytearray()
+        self._updated_at = array("q")
+        self._slot_by_id = array("l")
+        self._bitsets = {s.value: bytearray() for s in StatusEnum}
+        self._counts = {s.value: 0 for s in StatusEnum}
+
+    # --- Loading ---
+
+    def load(self, db) -> None:
+        """(Re)build the index from the database."""
+        with self._lock:
+            self._replay = []
+        try:
+            rows = db.execute(
+                select(User.id, User.full_name, User.status, User.updated_at).order_by(User.full_name)
+            ).yield_per(10000)
+
+            ids, names, statuses, updated_at = array("q"), [], bytearray(), array("q")
+            for user_id, full_name, status, updated in rows:
+                ids.append(user_id)
+                names.append(full_name)
+                statuses.append(status)
+                updated_at.append(_to_micros(updated or EPOCH))
+
+            slot_by_id = array("l", [NO_SLOT]) * (max(ids, default=0) + 1)
+            bitsets = {s.value: bytearray((len(ids) + 7) // 8) for s in StatusEnum}
+            counts = {s.value: 0 for s in StatusEnum}
+            for slot, (user_id, status) in enumerate(zip(ids, statuses)):
+                slot_by_id[user_id] = slot
+                bitsets[status][slot >> 3] |= 1 << (slot & 7)
+                counts[status] += 1
+
+            with self._lock:
+                self._ids, self._names, self._statuses, self._updated_at = ids, names, statuses, updated_at
+                self._slot_by_id, self._bitsets, self._counts = slot_by_id, bitsets, counts
+                self._has_snapshot = True
+                # The snapshot may predate writes made while it was read; apply them again
+                complete = True
+                for write in self._replay:
+                    complete = self._set_locked(*write) and complete
+                # A replayed user missing from the snapshot was created meanwhile; reload next time
+                self._loaded_at = time.monotonic() if complete else None
+        finally:
+            with self._lock:
+                self._replay = None
+
+    def ensure_loaded(self, db) -> None:
+        """
+        Load the index if it has never been loaded. If it is invalidated or
+        older than refresh_seconds, start a background reload and keep
+        serving the current snapshot.
+        """
+        if self._is_fresh():
+            return
+        if self._has_snapshot:
+            self._refresh_in_background()
+            return
+        with self._load_lock:
+            if not self._has_snapshot:
+                self.load(db)
+
+    def _refresh_in_background(self) -> None:
+        if not self._load_lock.acquire(blocking=False):
+            # Already reloading
+            return
+
+        def refresh():
+            db = ReadSessionLocal()
+            try:
+                self.load(db)
+            except Exception:
+                logger.exception("Failed to reload the presence index")
+            finally:
+                db.close()
+                self._load_lock.release()
+
+        threading.Thread(target=refresh, name="presence-refresh", daemon=True).start()
+
+    def _is_fresh(self) -> bool:
+        loaded_at = self._loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at <= self.refresh_seconds
+
+    def invalidate(self) -> None:
+        """Reload on next use."""
+        self._loaded_at = None
+
+    # --- Writes ---
+
+    def set_status(self, user_id: int, status: int, updated_at: datetime) -> None:
+        """Move a user to a new status in O(1)."""
+        micros = _to_micros(updated_at)
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((user_id, status, micros))
+            if not self._set_locked(user_id, status, micros):
+                # User created after the index was loaded
+                self._loaded_at = None
+
+    def _set_locked(self, user_id: int, status: int, micros: int) -> bool:
+        """Apply one write with the lock held; False if the user has no slot."""
+        slot = self._slot_by_id[user_id] if user_id < len(self._slot_by_id) else NO_SLOT
+        if slot == NO_SLOT:
+            return False
+
+        previous = self._statuses[slot]
+        byte, mask = slot >> 3, 1 << (slot & 7)
+        self._bitsets[previous][byte] &= ~mask & 0xFF
+        self._bitsets[status][byte] |= mask
+        self._counts[previous] -= 1
+        self._counts[status] += 1
+        self._statuses[slot] = status
+        self._updated_at[slot] = micros
+        return True
+
+    # --- Reads ---
+
+    def counts(self) -> Dict[int, int]:
+        """Number of users per status value."""
+        with self._lock:
+            return dict(self._counts)
+
+    def select(self, statuses: Optional[Iterable[int]] = None) -> List[PresenceRow]:
+        """Users with any of `statuses` (all users if None), ordered by full_name."""
+        with self._lock:
+            wanted = set(statuses) if statuses is not None else set(self._bitsets)
+            if wanted >= set(self._bitsets):
+                slots: Iterable[int] = range(len(self._ids))
+            else:
+                slots = self._slots_in(self._union(wanted))
+            return [self._row(slot) for slot in slots]
+
+    def _union(self, statuses: Iterable[int]) -> bytes:
+        size = len(self._statuses)
+        union = 0
+        for status in statuses:
+            union |= int.from_bytes(self._bitsets[status], "little")
+        return union.to_bytes((size + 7) // 8, "little")
+
+    @staticmethod
+    def _slots_in(bitset: bytes) -> List[int]:
+        return [
+            index << 3 | bit
+            for index, byte in enumerate(bitset) if byte
+            for bit in _BIT_POSITIONS[byte]
+        ]
+
+    def _row(self, slot: int) -> PresenceRow:
+        return (
+            self._ids[slot],
+            self._names[slot],
+            self._statuses[slot],
+            EPOCH + timedelta(microseconds=self._updated_at[slot]),
+        )
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the arrays, excluding name strings."""
+        return (
+            self._ids.itemsize * len(self._ids)
+            + len(self._statuses)
+            + self._updated_at.itemsize * len(self._updated_at)
+            + self._slot_by_id.itemsize * len(self._slot_by_id)
+            + sum(len(bitset) for bitset in self._bitsets.values())
+        )
+
+
+presence_index = PresenceIndex(refresh_seconds=settings.PRESENCE_REFRESH_SECONDS)
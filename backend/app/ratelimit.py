@@ -0,0 +1,89 @@
+"""
+In-memory admission control for the login endpoint.
+
+Every login attempt runs bcrypt, so a burst of bad logins can saturate
+the CPU and starve the rest of the API. This module provides:
+
+- A token-bucket limiter keyed by username and by client IP, bounded to
+  a fixed number of keys with least-recently-used eviction.
+- A concurrency cap on password hashing that sheds excess load instead
+  of queueing it behind the thread pool.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import settings
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket per key, held in a bounded LRU map.
+
+    Each key starts with `burst` tokens and refills at `rate_per_minute`.
+    Once `max_keys` keys are tracked, the least recently used key is
+    evicted, so memory stays constant no matter how many distinct
+    usernames or IPs an attacker cycles through.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> (tokens, last refill timestamp)
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """
+        Take one token for `key`.
+        Returns 0 if the request is allowed, otherwise the number of
+        seconds until a token becomes available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (float(self.burst), now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                retry_after = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                retry_after = (1 - tokens) / self.rate
+
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return retry_after
+
+    def refund(self, key: str) -> None:
+        """Give back a token taken by `acquire` for an attempt that didn't go ahead."""
+        with self._lock:
+            if key in self._buckets:
+                tokens, last = self._buckets[key]
+                self._buckets[key] = (min(self.burst, tokens + 1), last)
+
+    def reset(self, key: str) -> None:
+        """Forget a key, restoring its full burst."""
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# Limiters used by POST /login
+login_user_limiter = TokenBucketLimiter(
+    rate_per_minute=settings.LOGIN_USER_RATE_PER_MINUTE,
+    burst=settings.LOGIN_USER_BURST,
+    max_keys=settings.LOGIN_LIMITER_MAX_KEYS,
+)
+login_ip_limiter = TokenBucketLimiter(
+    rate_per_minute=settings.LOGIN_IP_RATE_PER_MINUTE,
+    burst=settings.LOGIN_IP_BURST,
+    max_keys=settings.LOGIN_LIMITER_MAX_KEYS,
+)
+
+# Caps how many bcrypt verifications run at once
+login_slots = threading.BoundedSemaphore(settings.LOGIN_MAX_CONCURRENCY)
@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from app.audit import audit_log
+from app.auth import require_admin
+from app.models import User
+from app.schemas import AuditEventResponse
+
+router = APIRouter(tags=["audit"])
+
+
+@router.get("/audit", response_model=List[AuditEventResponse])
+def get_audit_events(
+    username: Optional[str] = Query(default=None, description="Only events for this username"),
+    event: Optional[str] = Query(default=None, description="Only this event type (login, status_change)"),
+    since: Optional[datetime] = Query(default=None, description="Only events at or after this time (UTC)"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Query the audit log, newest first.
+    
+    Protected route - restricted to ADMIN_USERNAMES.
+    """
+    # Stored timestamps are naive UTC
+    if since is not None and since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return audit_log.sink.query(username=username, event=event, since=since, limit=limit)
@@ -1,32 +1,77 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import math
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 
+from app.audit import audit_log
 from app.database import get_db
 from app.models import User
 from app.schemas import LoginRequest, TokenResponse
-from app.auth import verify_password, create_access_token
+from app.auth import verify_password, get_dummy_hash, create_access_token
+from app.ratelimit import login_user_limiter, login_ip_limiter, login_slots
 
 router = APIRouter(tags=["auth"])
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(request: LoginRequest, db: Session = Depends(get_db)):
+def login(request: LoginRequest, http_request: Request, db: Session = Depends(get_db)):
     """
     Authenticate user and return JWT token.
     """
-    # Find user by username
-    user = db.query(User).filter(User.username == request.username).first()
-    
-    # Verify user exists and password is correct
-    if not user or not verify_password(request.password, user.password_hash):
+    # Throttle per username and per client IP before doing any hashing
+    user_key = request.username.lower()
+    client_ip = http_request.client.host if http_request.client else "unknown"
+    user_retry_after = login_user_limiter.acquire(user_key)
+    ip_retry_after = login_ip_limiter.acquire(client_ip)
+    if user_retry_after > 0 or ip_retry_after > 0:
+        # Only the bucket that rejected the attempt pays for it
+        if user_retry_after == 0:
+            login_user_limiter.refund(user_key)
+        if ip_retry_after == 0:
+            login_ip_limiter.refund(client_ip)
+        audit_log.record("login", request.username, client_ip, outcome="throttled")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, try again later",
+            headers={"Retry-After": str(math.ceil(max(user_retry_after, ip_retry_after)))},
+        )
+
+    # Shed load rather than queue when too many hashes are already running
+    if not login_slots.acquire(blocking=False):
+        # The password was never checked, so don't count this against the user
+        # (the IP keeps its charge, so shedding still slows down a flood)
+        login_user_limiter.refund(user_key)
+        audit_log.record("login", request.username, client_ip, outcome="shed")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Login temporarily unavailable, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    try:
+        # Find user by username
+        user = db.query(User).filter(User.username == request.username).first()
+
+        # Verify against a dummy hash for unknown users so timing doesn't leak existence
+        password_hash = user.password_hash if user else get_dummy_hash()
+        password_ok = verify_password(request.password, password_hash)
+    finally:
+        login_slots.release()
+
+    if not user or not password_ok:
+        audit_log.record("login", request.username, client_ip, outcome="failure")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
+    audit_log.record("login", user.username, client_ip, outcome="success")
+
+    # Successful login clears the username's failed-attempt budget
+    login_user_limiter.reset(user_key)
+
     # Create access token
     access_token = create_access_token(data={"sub": user.username})
-    
-    return TokenResponse(access_token=access_token)
 
+    return TokenResponse(access_token=access_token)
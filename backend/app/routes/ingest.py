@@ -0,0 +1,48 @@
+import io
+import tempfile
+from enum import Enum
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.auth import require_admin
+from app.ingest import ingest_feed
+from app.models import User
+from app.schemas import IngestReport
+
+router = APIRouter(tags=["ingest"])
+
+# Feeds larger than this are spooled to disk instead of memory
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+class FeedFormat(str, Enum):
+    """Supported feed formats."""
+    CSV = "csv"
+    ICS = "ics"
+
+
+@router.post("/ingest/statuses", response_model=IngestReport)
+async def ingest_statuses(
+    request: Request,
+    format: FeedFormat = Query(description="Feed format of the request body"),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Apply statuses from a CSV or ICS feed sent as the raw request body.
+    Only users whose status changes are written.
+    
+    Protected route - restricted to ADMIN_USERNAMES.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+
+        feed = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+        try:
+            return await run_in_threadpool(ingest_feed, feed, format.value)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+        finally:
+            feed.detach()
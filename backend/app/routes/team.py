@@ -1,53 +1,85 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.audit import audit_log
+from app.config import settings
+from app.database import get_db, get_read_db, recent_writers
 from app.models import User
+from app.presence import presence_index
 from app.schemas import UserResponse, StatusUpdateRequest, StatusEnum, STATUS_LABELS
-from app.auth import get_current_user
+from app.auth import get_current_user, get_current_user_read
 
 router = APIRouter(tags=["team"])
 
 
+def _to_response(user_id: int, full_name: str, status: int, updated_at: datetime) -> UserResponse:
+    """Build the API representation of a team member."""
+    return UserResponse(
+        id=user_id,
+        full_name=full_name,
+        status=STATUS_LABELS[StatusEnum(status)],
+        updated_at=updated_at
+    )
+
+
 @router.get("/team", response_model=List[UserResponse])
 def get_team(
     status: Optional[List[StatusEnum]] = Query(default=None, description="Filter by status(es)"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    read_db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_read)
 ):
     """
     Get all team members with their statuses.
     Optionally filter by one or more statuses.
     
+    Served from the in-memory presence index (loaded through the read
+    engine). With a separate READ_DATABASE_URL, callers who just wrote
+    are served from the writer instead, since the index may have been
+    loaded from a replica that doesn't have their write yet.
+    
     Protected route - requires authentication.
     """
-    query = db.query(User)
-    
-    # Apply status filter if provided
-    if status:
-        status_values = [s.value for s in status]
-        query = query.filter(User.status.in_(status_values))
-    
-    users = query.order_by(User.full_name).all()
+    status_values = [s.value for s in status] if status else None
+
+    if settings.READ_DATABASE_URL and recent_writers.is_recent(current_user.id):
+        query = select(User.id, User.full_name, User.status, User.updated_at)
+        
+        # Apply status filter if provided
+        if status_values:
+            query = query.where(User.status.in_(status_values))
+        
+        return [_to_response(*row) for row in db.execute(query.order_by(User.full_name))]
+
+    presence_index.ensure_loaded(read_db)
+    return [_to_response(*row) for row in presence_index.select(status_values)]
+
+
+@router.get("/team/counts", response_model=Dict[str, int])
+def get_team_counts(
+    read_db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_read)
+):
+    """
+    Get the number of team members in each status.
     
-    # Convert to response format with status labels
-    return [
-        UserResponse(
-            id=user.id,
-            full_name=user.full_name,
-            status=STATUS_LABELS[StatusEnum(user.status)],
-            updated_at=user.updated_at
-        )
-        for user in users
-    ]
+    Protected route - requires authentication.
+    """
+    presence_index.ensure_loaded(read_db)
+    return {
+        STATUS_LABELS[StatusEnum(value)]: count
+        for value, count in presence_index.counts().items()
+    }
 
 
 @router.patch("/me/status", response_model=UserResponse)
 def update_my_status(
     request: StatusUpdateRequest,
+    http_request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -56,17 +88,25 @@ def update_my_status(
     
     Protected route - requires authentication.
     """
+    previous_status = current_user.status
+
     # Update user's status
     current_user.status = request.status.value
     current_user.updated_at = datetime.utcnow()
     
     db.commit()
     db.refresh(current_user)
+    presence_index.set_status(current_user.id, current_user.status, current_user.updated_at)
+    recent_writers.mark(current_user.id)
+    audit_log.record(
+        "status_change",
+        current_user.username,
+        http_request.client.host if http_request.client else None,
+        previous=previous_status,
+        current=current_user.status,
+    )
     
-    return UserResponse(
-        id=current_user.id,
-        full_name=current_user.full_name,
-        status=STATUS_LABELS[StatusEnum(current_user.status)],
-        updated_at=current_user.updated_at
+    return _to_response(
+        current_user.id, current_user.full_name, current_user.status, current_user.updated_at
     )
 
@@ -1,5 +1,6 @@
 from datetime import datetime
 from enum import Enum
+from typing import Optional
 from pydantic import BaseModel
 
 
@@ -51,3 +52,27 @@ class StatusUpdateRequest(BaseModel):
     """Request body for updating user status."""
     status: StatusEnum
 
+
+# --- Audit Schemas ---
+
+class AuditEventResponse(BaseModel):
+    """Audit log entry returned by the audit endpoint."""
+    created_at: datetime
+    event: str
+    username: str
+    client_ip: Optional[str] = None
+    detail: dict
+
+
+# --- Ingestion Schemas ---
+
+class IngestReport(BaseModel):
+    """Summary of a bulk status feed ingestion."""
+    rows: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    unknown_users: int = 0
+    invalid_rows: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    rows_per_second: float = 0.0
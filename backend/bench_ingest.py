@@ -0,0 +1,70 @@
+"""
+Benchmark bulk status ingestion against a large feed.
+
+Creates a temporary SQLite database with N users, writes an N-row CSV feed
+in which roughly a third of the statuses change, and ingests it. Reports
+rows/sec and peak resident memory.
+
+Usage: python bench_ingest.py [users]
+"""
+import os
+import random
+import resource
+import sys
+import tempfile
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Point the app at the temporary database before it is imported
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+
+        from sqlalchemy import func, insert, select
+
+        from app.audit import audit_log, make_sink
+        from app.database import engine
+        from app.ingest import ingest_feed
+        from app.migrations import ensure_schema
+        from app.models import AuditEvent, User
+
+        ensure_schema(engine)
+        rng = random.Random(42)
+        statuses = [rng.randrange(4) for _ in range(users)]
+        with engine.begin() as conn:
+            for offset in range(0, users, 10_000):
+                conn.execute(insert(User), [
+                    {"username": f"user{i}", "password_hash": "-", "full_name": f"User {i}", "status": statuses[i]}
+                    for i in range(offset, min(offset + 10_000, users))
+                ])
+
+        feed_path = os.path.join(tmp, "feed.csv")
+        with open(feed_path, "w", newline="") as feed:
+            feed.write("email,status\n")
+            for i in range(users):
+                status = rng.randrange(4) if rng.random() < 0.33 else statuses[i]
+                feed.write(f"user{i}@example.com,{status}\n")
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        audit_log.start(make_sink())
+        try:
+            with open(feed_path, newline="") as feed:
+                report = ingest_feed(feed, "csv")
+        finally:
+            audit_log.stop()
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        with engine.connect() as conn:
+            audited = conn.execute(select(func.count()).select_from(AuditEvent)).scalar()
+
+    print(f"Users / rows:  {users:,} / {report.rows:,}")
+    print(f"Changed:       {report.changed:,} in {report.chunks} chunk(s), unchanged {report.unchanged:,}")
+    print(f"Audited:       {audited:,} status changes")
+    print(f"Throughput:    {report.rows_per_second:,.0f} rows/sec ({report.seconds:.2f}s)")
+    # ru_maxrss is in KiB on Linux
+    print(f"Peak RSS:      {rss_after / 1024:.0f} MiB (+{(rss_after - rss_before) / 1024:.0f} MiB during ingest)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark the in-memory presence index against the SQL path.
+
+Creates a temporary SQLite database with N users and compares, for
+single- and multi-status filters and for status counts, the SQL queries
+GET /team used to run with the presence index. Results of both paths are
+checked to be identical.
+
+Usage: python bench_presence.py [users]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    """Fastest of `repeat` runs, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Point the app at the temporary database before it is imported
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+
+        from datetime import datetime, timedelta
+
+        from sqlalchemy import func, insert, select
+
+        from app.database import ReadSessionLocal, engine
+        from app.migrations import ensure_schema
+        from app.models import User
+        from app.presence import PresenceIndex
+
+        ensure_schema(engine)
+        rng = random.Random(42)
+        # Mostly working, a few away, like a real team
+        weights = [70, 20, 7, 3]
+        now = datetime.utcnow()
+        with engine.begin() as conn:
+            for offset in range(0, users, 10_000):
+                conn.execute(insert(User), [
+                    {
+                        "username": f"user{i}",
+                        "password_hash": "-",
+                        "full_name": f"User {rng.randrange(10**9):09d} {i}",
+                        "status": rng.choices(range(4), weights)[0],
+                        "updated_at": now - timedelta(seconds=rng.randrange(10**6)),
+                    }
+                    for i in range(offset, min(offset + 10_000, users))
+                ])
+
+        db = ReadSessionLocal()
+        index = PresenceIndex(refresh_seconds=3600)
+        load_ms = best_of(lambda: index.load(db), repeat=1)
+
+        def sql_select(statuses):
+            query = select(User.id, User.full_name, User.status, User.updated_at)
+            if statuses:
+                query = query.where(User.status.in_(statuses))
+            return [tuple(row) for row in db.execute(query.order_by(User.full_name))]
+
+        def sql_counts():
+            return dict(db.execute(select(User.status, func.count()).group_by(User.status)).all())
+
+        print(f"{users:,} users, index load {load_ms:.0f}ms, "
+              f"{index.nbytes() / users:.1f} bytes/user in arrays (plus name strings)")
+        print(f"{'query':<22}{'SQL':>10}{'index':>10}{'speedup':>10}")
+
+        for label, statuses in [("status=3", [3]), ("status=2&status=3", [2, 3]), ("status=1,2,3", [1, 2, 3])]:
+            assert sql_select(statuses) == index.select(statuses), f"Results differ for {label}"
+            sql_ms = best_of(lambda: sql_select(statuses))
+            index_ms = best_of(lambda: index.select(statuses))
+            print(f"{label:<22}{sql_ms:>9.1f}ms{index_ms:>9.1f}ms{sql_ms / index_ms:>9.0f}x")
+
+        assert sql_counts() == {k: v for k, v in index.counts().items() if v}, "Counts differ"
+        sql_ms = best_of(sql_counts)
+        index_ms = best_of(index.counts)
+        print(f"{'counts':<22}{sql_ms:>9.1f}ms{index_ms:>9.3f}ms{sql_ms / index_ms:>9.0f}x")
+
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark time-to-first-healthy-response for the API server.
+
+Boots uvicorn as a subprocess against a temporary SQLite database and polls
+GET /health until it answers. The first run starts from an empty database
+(migrations applied); the following runs reuse it, which is the normal
+restart/autoscaling case.
+
+Usage: python bench_startup.py [runs]
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+
+def free_port() -> int:
+    """Ask the OS for an unused local port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_healthy(database_url: str, timeout: float = 30.0) -> float:
+    """Start the server and return seconds until /health returns 200."""
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=database_url)
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"Server did not become healthy within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+
+        cold = time_to_healthy(database_url)
+        warm = [time_to_healthy(database_url) for _ in range(runs)]
+
+    print(f"Empty database:    {cold * 1000:.0f}ms")
+    print(f"Up-to-date schema: median {statistics.median(warm) * 1000:.0f}ms, "
+          f"min {min(warm) * 1000:.0f}ms, max {max(warm) * 1000:.0f}ms ({runs} runs)")
+
+
+if __name__ == "__main__":
+    main()
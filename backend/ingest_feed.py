@@ -0,0 +1,44 @@
+"""
+Apply statuses from an HR or calendar feed (CSV or ICS).
+
+Streams the feed, diffs it against current statuses and writes only the
+changes, in chunked transactions. Status changes are recorded in the
+audit log.
+
+Usage: python ingest_feed.py FEED [--format csv|ics] [--chunk-size N]
+"""
+import argparse
+
+from app.audit import audit_log, make_sink
+from app.database import engine
+from app.ingest import ingest_feed
+from app.migrations import ensure_schema
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a status feed")
+    parser.add_argument("feed", help="Path to a .csv or .ics feed")
+    parser.add_argument("--format", choices=["csv", "ics"], help="Feed format (default: from file extension)")
+    parser.add_argument("--chunk-size", type=int, help="Users updated per transaction")
+    args = parser.parse_args()
+
+    feed_format = args.format or args.feed.rsplit(".", 1)[-1].lower()
+
+    ensure_schema(engine)
+    audit_log.start(make_sink())
+    try:
+        with open(args.feed, encoding="utf-8-sig", newline="") as feed:
+            report = ingest_feed(feed, feed_format, args.chunk_size)
+    finally:
+        audit_log.stop()
+
+    print(f"Rows read:      {report.rows}")
+    print(f"Changed:        {report.changed} ({report.chunks} chunk(s))")
+    print(f"Unchanged:      {report.unchanged}")
+    print(f"Unknown users:  {report.unknown_users}")
+    print(f"Invalid rows:   {report.invalid_rows}")
+    print(f"Throughput:     {report.rows_per_second:,.0f} rows/sec ({report.seconds:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,17 @@
 Seed script to populate the database with initial team members.
 Run this script to set up the database with test users.
 
+This is a one-time job: the API server does not run it on startup.
+With Docker Compose it runs as the `seed` service before the backend starts.
+
 Usage: python seed.py
 """
-from app.database import SessionLocal, engine, Base
+from app.database import SessionLocal, engine
+from app.migrations import ensure_schema
 from app.models import User
 from app.auth import hash_password
 from app.schemas import StatusEnum
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
-
 # Team members to seed
 TEAM_MEMBERS = [
     {
@@ -49,6 +50,7 @@ TEAM_MEMBERS = [
 
 def seed_database():
     """Seed the database with team members."""
+    ensure_schema(engine)
     db = SessionLocal()
     
     try:
@@ -1,36 +1,175 @@
 """
-Test script for Team Presence Dashboard API.
+Test suite for Team Presence Dashboard API.
 Uses simple assertions instead of pytest.
 
-Usage: python tests.py
+Boots app.main:app in-process against a temporary SQLite database with
+fixture users and drives it over an ASGI transport, so no server needs to
+be running. All tests run concurrently, each with its own client IP and
+users it may modify, and can assert how many SQL queries and how much time
+a request took.
 
-Make sure the server is running on localhost:8000 before running tests.
+Usage: python tests.py
 """
-from typing import Optional
-import requests
+import asyncio
+import io
+import os
+import shutil
 import sys
-
-BASE_URL = "http://localhost:8000"
-
-# Test credentials (must match seed data)
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+# Configure the app before importing it: a throwaway database (also named
+# as the read database, standing in for a replica so read routing and
+# read-your-writes are exercised), fast audit flushes, and a login
+# concurrency cap sized for the whole suite at once
+TEST_DIR = tempfile.mkdtemp(prefix="team-presence-tests-")
+TEST_DATABASE_URL = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ.update({
+    "DATABASE_URL": TEST_DATABASE_URL,
+    "READ_DATABASE_URL": TEST_DATABASE_URL,
+    "ADMIN_USERNAMES": '["admin"]',
+    "AUDIT_SINK": "database",
+    "AUDIT_FLUSH_INTERVAL_SECONDS": "0.05",
+    "LOGIN_MAX_CONCURRENCY": "64",
+})
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.audit import SegmentFileAuditSink  # noqa: E402
+from app.auth import create_access_token  # noqa: E402
+from app.database import ReadSessionLocal, SessionLocal, read_engine, write_engine  # noqa: E402
+from app.ingest import parse_csv, parse_ics  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import User  # noqa: E402
+from app.presence import PresenceIndex, presence_index  # noqa: E402
+from app.ratelimit import TokenBucketLimiter, login_ip_limiter  # noqa: E402
+from app.schemas import StatusEnum  # noqa: E402
+
+# bcrypt hash of "password123" at cost 4 instead of 12, so fixture setup
+# skips hashing entirely and logins verify in about a millisecond
+PASSWORD_HASH = "$2b$04$00GaMy9syLpLtuxmQZEKPO7IINIzcOWMGrK5tnipbo9b7AS4wuM1a"
+
+# Fixture users: the seed team, plus users owned by tests that modify them
+FIXTURE_USERS = [
+    ("samc", "Sam Cooke", 0),
+    ("afranklin", "Aretha Franklin", 1),
+    ("kingluther", "Luther Vandross", 2),
+    ("gknight", "Gladys Knight", 3),
+    ("otis", "Otis Redding", 0),
+    ("status-writer", "Status Writer", 0),
+    ("status-cycler", "Status Cycler", 0),
+    ("ingest-target", "Ingest Target", 0),
+    ("admin", "Audit Admin", 0),
+    ("sticky-writer", "Sticky Writer", 0),
+    ("ics-target", "Ics Target", 0),
+    ("ingest-flipper", "Ingest Flipper", 0),
+]
+
+# Test credentials (must match fixture users)
 VALID_USER = {"username": "samc", "password": "password123"}
 INVALID_USER = {"username": "samc", "password": "wrongpassword"}
 NONEXISTENT_USER = {"username": "nobody", "password": "password123"}
 
+# Query and latency budgets per endpoint
+BUDGETS = {
+    "/login": {"max_queries": 1, "max_ms": 500},
+    "/team": {"max_queries": 1, "max_ms": 500},
+    "/me/status": {"max_queries": 3, "max_ms": 500},
+}
+
+
+# =============================================================================
+# Harness
+# =============================================================================
+
+class Measurement:
+    """SQL statements and wall time of the requests inside a measure() block."""
+
+    def __init__(self):
+        # (engine, statement) pairs, engine being "reader" or "writer"
+        self.queries: List[Tuple[str, str]] = []
+        self.seconds = 0.0
+
+    @property
+    def statements(self) -> List[str]:
+        return [statement for _, statement in self.queries]
+
+    def on(self, engine: str) -> List[str]:
+        """Statements that ran on the given engine ("reader" or "writer")."""
+        return [statement for name, statement in self.queries if name == engine]
+
+    def assert_within(self, budget: dict, label: str):
+        """Fail if the query count or latency exceeds `budget`."""
+        assert len(self.queries) <= budget["max_queries"], \
+            f"{label}: expected at most {budget['max_queries']} queries, ran {len(self.queries)}: {self.queries}"
+        assert self.seconds * 1000 <= budget["max_ms"], \
+            f"{label}: expected at most {budget['max_ms']}ms, took {self.seconds * 1000:.0f}ms"
+
+
+# Measurement for the current test; contextvars follow requests into the
+# threadpool, so concurrent tests are counted separately
+_measurement: ContextVar[Optional[Measurement]] = ContextVar("measurement", default=None)
+
+
+def _statement_counter(engine: str):
+    def count(conn, cursor, statement, parameters, context, executemany):
+        measurement = _measurement.get()
+        if measurement is not None:
+            measurement.queries.append((engine, statement))
+    return count
+
+
+assert read_engine is not write_engine, "Tests need separate reader and writer engines"
+event.listen(read_engine, "before_cursor_execute", _statement_counter("reader"))
+event.listen(write_engine, "before_cursor_execute", _statement_counter("writer"))
+
+
+@asynccontextmanager
+async def measure():
+    """Count queries and time the requests made inside the block."""
+    measurement = Measurement()
+    token = _measurement.set(measurement)
+    started = time.perf_counter()
+    try:
+        yield measurement
+    finally:
+        measurement.seconds = time.perf_counter() - started
+        _measurement.reset(token)
 
-def get_token(username: str, password: str) -> Optional[str]:
-    """Helper to get auth token."""
-    response = requests.post(
-        f"{BASE_URL}/login",
-        json={"username": username, "password": password}
-    )
-    if response.status_code == 200:
-        return response.json()["access_token"]
-    return None
+
+def setup_fixtures():
+    """Insert fixture users with pre-hashed passwords and warm the presence index."""
+    db = SessionLocal()
+    try:
+        db.add_all(
+            User(username=username, password_hash=PASSWORD_HASH, full_name=full_name, status=status)
+            for username, full_name, status in FIXTURE_USERS
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    db = ReadSessionLocal()
+    try:
+        presence_index.load(db)
+    finally:
+        db.close()
 
 
-def auth_header(token: str) -> dict:
-    """Helper to create auth header."""
+def make_client(client_ip: str) -> httpx.AsyncClient:
+    """Client talking to the app in-process, appearing to come from `client_ip`."""
+    transport = httpx.ASGITransport(app=app, client=(client_ip, 50000))
+    return httpx.AsyncClient(transport=transport, base_url="http://testserver")
+
+
+def auth_header(username: str) -> dict:
+    """Helper to create auth header (mints a token directly, no login)."""
+    token = create_access_token(data={"sub": username})
     return {"Authorization": f"Bearer {token}"}
 
 
@@ -38,317 +177,786 @@ def auth_header(token: str) -> dict:
 # Health Check Tests
 # =============================================================================
 
-def test_health_check():
+async def test_health_check(client):
     """Test that health endpoint returns healthy status."""
-    response = requests.get(f"{BASE_URL}/health")
-    
+    response = await client.get("/health")
+
     assert response.status_code == 200, f"Expected 200, got {response.status_code}"
     assert response.json()["status"] == "healthy", "Health check should return healthy"
-    print("✅ test_health_check passed")
 
 
 # =============================================================================
 # Authentication Tests
 # =============================================================================
 
-def test_login_success():
+async def test_login_success(client):
     """Test successful login returns a token."""
-    response = requests.post(f"{BASE_URL}/login", json=VALID_USER)
-    
+    async with measure() as m:
+        response = await client.post("/login", json=VALID_USER)
+
     assert response.status_code == 200, f"Expected 200, got {response.status_code}"
     data = response.json()
     assert "access_token" in data, "Response should contain access_token"
     assert data["token_type"] == "bearer", "Token type should be bearer"
     assert len(data["access_token"]) > 0, "Token should not be empty"
-    print("✅ test_login_success passed")
+    m.assert_within(BUDGETS["/login"], "POST /login")
 
 
-def test_login_wrong_password():
+async def test_login_wrong_password(client):
     """Test login with wrong password returns 401."""
-    response = requests.post(f"{BASE_URL}/login", json=INVALID_USER)
-    
+    response = await client.post("/login", json=INVALID_USER)
+
     assert response.status_code == 401, f"Expected 401, got {response.status_code}"
     assert "detail" in response.json(), "Response should contain error detail"
-    print("✅ test_login_wrong_password passed")
 
 
-def test_login_nonexistent_user():
+async def test_login_nonexistent_user(client):
     """Test login with nonexistent user returns 401."""
-    response = requests.post(f"{BASE_URL}/login", json=NONEXISTENT_USER)
-    
+    response = await client.post("/login", json=NONEXISTENT_USER)
+
     assert response.status_code == 401, f"Expected 401, got {response.status_code}"
-    print("✅ test_login_nonexistent_user passed")
 
 
-def test_login_missing_fields():
+async def test_login_missing_fields(client):
     """Test login with missing fields returns 422."""
-    response = requests.post(f"{BASE_URL}/login", json={"username": "samc"})
-    
+    response = await client.post("/login", json={"username": "samc"})
+
     assert response.status_code == 422, f"Expected 422, got {response.status_code}"
-    print("✅ test_login_missing_fields passed")
+
+
+async def test_login_throttled(client):
+    """Test repeated failed logins for one username are rejected with 429."""
+    probe = {"username": "throttle-probe", "password": "wrongpassword"}
+
+    statuses = [(await client.post("/login", json=probe)).status_code for _ in range(6)]
+
+    assert statuses[0] == 401, f"Expected first attempt 401, got {statuses[0]}"
+    assert statuses[-1] == 429, f"Expected 429 after burst, got {statuses[-1]}"
+    async with measure() as m:
+        response = await client.post("/login", json=probe)
+    assert "Retry-After" in response.headers, "429 response should include Retry-After"
+    assert not m.statements, f"Throttled login should not query the database: {m.statements}"
+
+    outcomes = []
+    for _ in range(40):
+        events = (await client.get("/audit?username=throttle-probe", headers=auth_header("admin"))).json()
+        outcomes = [e["detail"]["outcome"] for e in events]
+        if outcomes.count("throttled") == 2:
+            break
+        await asyncio.sleep(0.05)
+    assert outcomes.count("throttled") == 2, f"Throttled attempts should be audited, got {outcomes}"
+
+
+async def test_login_throttle_spares_other_bucket(client):
+    """Test attempts rejected for the username don't use up the client IP's budget."""
+    probe = {"username": "throttle-probe-ip", "password": "wrongpassword"}
+    client_ip = client._transport.client[0]
+
+    for _ in range(5):
+        await client.post("/login", json=probe)
+    tokens_before, _ = login_ip_limiter._buckets[client_ip]
+
+    statuses = [(await client.post("/login", json=probe)).status_code for _ in range(10)]
+    tokens_after, _ = login_ip_limiter._buckets[client_ip]
+
+    assert set(statuses) == {429}, f"Expected only 429s, got {statuses}"
+    assert tokens_after >= tokens_before, \
+        f"IP bucket was charged for rejected attempts: {tokens_before:.2f} -> {tokens_after:.2f}"
+
+
+async def test_limiter_refund(client):
+    """Test a refunded token is usable again, up to the burst."""
+    limiter = TokenBucketLimiter(rate_per_minute=0.001, burst=2, max_keys=10)
+
+    assert limiter.acquire("k") == 0 and limiter.acquire("k") == 0, "Burst should allow two attempts"
+    assert limiter.acquire("k") > 0, "Third attempt should be rejected"
+    limiter.refund("k")
+    assert limiter.acquire("k") == 0, "Refunded token should be usable"
+
+    limiter.refund("k")
+    limiter.refund("k")
+    limiter.refund("k")
+    assert limiter._buckets["k"][0] <= 2, "Refunds should not exceed the burst"
 
 
 # =============================================================================
 # GET /team Tests
 # =============================================================================
 
-def test_get_team_authenticated():
+async def test_get_team_authenticated(client):
     """Test GET /team with valid auth returns team list."""
-    token = get_token(**VALID_USER)
-    assert token is not None, "Should be able to get token"
-    
-    response = requests.get(f"{BASE_URL}/team", headers=auth_header(token))
-    
+    async with measure() as m:
+        response = await client.get("/team", headers=auth_header("samc"))
+
     assert response.status_code == 200, f"Expected 200, got {response.status_code}"
     data = response.json()
     assert isinstance(data, list), "Response should be a list"
     assert len(data) >= 5, f"Should have at least 5 team members, got {len(data)}"
-    
+
     # Verify user structure
     user = data[0]
     assert "id" in user, "User should have id"
     assert "full_name" in user, "User should have full_name"
     assert "status" in user, "User should have status"
     assert "updated_at" in user, "User should have updated_at"
-    print("✅ test_get_team_authenticated passed")
 
+    names = [u["full_name"] for u in data]
+    assert names == sorted(names), "Team should be ordered by full name"
+    m.assert_within(BUDGETS["/team"], "GET /team")
 
-def test_get_team_unauthenticated():
+
+async def test_get_team_unauthenticated(client):
     """Test GET /team without auth returns 401."""
-    response = requests.get(f"{BASE_URL}/team")
-    
+    response = await client.get("/team")
+
     assert response.status_code == 401, f"Expected 401, got {response.status_code}"
-    print("✅ test_get_team_unauthenticated passed")
 
 
-def test_get_team_invalid_token():
+async def test_get_team_invalid_token(client):
     """Test GET /team with invalid token returns 401."""
-    response = requests.get(
-        f"{BASE_URL}/team",
+    response = await client.get(
+        "/team",
         headers={"Authorization": "Bearer invalidtoken123"}
     )
-    
+
     assert response.status_code == 401, f"Expected 401, got {response.status_code}"
-    print("✅ test_get_team_invalid_token passed")
 
 
-def test_get_team_filter_single_status():
+async def test_get_team_filter_single_status(client):
     """Test GET /team with single status filter."""
-    token = get_token(**VALID_USER)
-    
     # Filter by "Working" status (0)
-    response = requests.get(
-        f"{BASE_URL}/team?status=0",
-        headers=auth_header(token)
-    )
-    
+    async with measure() as m:
+        response = await client.get("/team?status=0", headers=auth_header("samc"))
+
     assert response.status_code == 200, f"Expected 200, got {response.status_code}"
     data = response.json()
     assert isinstance(data, list), "Response should be a list"
-    
+
     # All returned users should have "Working" status
     for user in data:
         assert user["status"] == "Working", f"Expected 'Working', got '{user['status']}'"
-    print("✅ test_get_team_filter_single_status passed")
+    m.assert_within(BUDGETS["/team"], "GET /team?status=0")
 
 
-def test_get_team_filter_multiple_statuses():
+async def test_get_team_filter_multiple_statuses(client):
     """Test GET /team with multiple status filters (bonus feature)."""
-    token = get_token(**VALID_USER)
-    
-    # Filter by "Working" (0) and "On Vacation" (2)
-    response = requests.get(
-        f"{BASE_URL}/team?status=0&status=2",
-        headers=auth_header(token)
-    )
-    
+    # Filter by "Working Remotely" (1) and "On Vacation" (2)
+    async with measure() as m:
+        response = await client.get("/team?status=1&status=2", headers=auth_header("samc"))
+
     assert response.status_code == 200, f"Expected 200, got {response.status_code}"
     data = response.json()
-    
+
     # All returned users should have one of the filtered statuses
-    valid_statuses = {"Working", "On Vacation"}
+    valid_statuses = {"Working Remotely", "On Vacation"}
     for user in data:
         assert user["status"] in valid_statuses, \
             f"Expected status in {valid_statuses}, got '{user['status']}'"
-    print("✅ test_get_team_filter_multiple_statuses passed")
+    names = {u["full_name"] for u in data}
+    assert {"Aretha Franklin", "Luther Vandross"} <= names, f"Missing fixture users in {names}"
+    m.assert_within(BUDGETS["/team"], "GET /team?status=1&status=2")
 
 
-def test_get_team_filter_no_results():
+async def test_get_team_filter_no_results(client):
     """Test GET /team filter that matches no users."""
-    token = get_token(**VALID_USER)
-    
-    # First update all users to different statuses, then filter by unused status
     # For now, just verify the endpoint handles empty results gracefully
-    response = requests.get(
-        f"{BASE_URL}/team?status=0&status=1&status=2&status=3",
-        headers=auth_header(token)
+    response = await client.get(
+        "/team?status=0&status=1&status=2&status=3",
+        headers=auth_header("samc")
     )
-    
+
     assert response.status_code == 200, f"Expected 200, got {response.status_code}"
     assert isinstance(response.json(), list), "Response should be a list"
-    print("✅ test_get_team_filter_no_results passed")
+
+
+async def test_get_team_counts(client):
+    """Test GET /team/counts returns a count per status matching the team list."""
+    response = await client.get("/team/counts", headers=auth_header("samc"))
+
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    counts = response.json()
+    expected_labels = {"Working", "Working Remotely", "On Vacation", "Business Trip"}
+    assert set(counts) == expected_labels, f"Expected labels {expected_labels}, got {set(counts)}"
+    assert sum(counts.values()) == len(FIXTURE_USERS), \
+        f"Counts sum to {sum(counts.values())}, expected {len(FIXTURE_USERS)} users"
+
+
+async def test_team_reads_use_read_engine(client):
+    """Test GET /team and /team/counts never touch the writer, including the user lookup."""
+    async with measure() as m:
+        team = await client.get("/team?status=0", headers=auth_header("otis"))
+        counts = await client.get("/team/counts", headers=auth_header("otis"))
+
+    assert team.status_code == 200 and counts.status_code == 200, "Read routes should succeed"
+    assert not m.on("writer"), f"Read routes ran on the writer: {m.on('writer')}"
+    assert len(m.on("reader")) == 2, f"Expected one user lookup per request on the reader: {m.on('reader')}"
+
+
+async def test_sticky_caller_reads_from_writer(client):
+    """Test a caller who just updated their status reads /team from the writer."""
+    headers = auth_header("sticky-writer")
+
+    async with measure() as m:
+        response = await client.patch("/me/status", json={"status": 2}, headers=headers)
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    assert not m.on("reader"), f"Status update ran on the reader: {m.on('reader')}"
+
+    async with measure() as m:
+        team = (await client.get("/team?status=2", headers=headers)).json()
+    assert any("FROM users" in s and "ORDER BY" in s for s in m.on("writer")), \
+        f"Sticky caller's team query should run on the writer: {m.queries}"
+    assert "Sticky Writer" in {u["full_name"] for u in team}, "Caller should see their own update"
+
+    async with measure() as m:
+        await client.get("/team?status=2", headers=auth_header("otis"))
+    assert not m.on("writer"), f"Other callers should not be sticky: {m.on('writer')}"
+
+
+# =============================================================================
+# Presence index Tests
+# =============================================================================
+
+class FakeReadSession:
+    """Stands in for a session in PresenceIndex.load, yielding fixed rows."""
+
+    def __init__(self, rows, during_load=None):
+        self.rows = rows
+        self.during_load = during_load
+
+    def execute(self, query):
+        return self
+
+    def yield_per(self, count):
+        for i, row in enumerate(self.rows):
+            if i == 1 and self.during_load:
+                self.during_load()
+            yield row
+
+
+async def test_presence_replays_writes_during_load(client):
+    """Test writes made while the index is loading survive the snapshot swap."""
+    index = PresenceIndex(refresh_seconds=60)
+    changed_at = datetime(2024, 1, 1, 12)
+    # Ann's row has already been read when her status changes
+    rows = [(1, "Ann", 0, None), (2, "Bob", 0, None)]
+    index.load(FakeReadSession(rows, during_load=lambda: index.set_status(1, 2, changed_at)))
+
+    assert index.select([2]) == [(1, "Ann", 2, changed_at)], f"Write was lost: {index.select()}"
+    assert index.counts()[0] == 1 and index.counts()[2] == 1, f"Unexpected counts {index.counts()}"
+    assert index._is_fresh(), "Index should be fresh after replaying known users"
+
+    # A user created during the load is not in the snapshot, so reload next time
+    index.load(FakeReadSession(rows, during_load=lambda: index.set_status(3, 1, changed_at)))
+    assert not index._is_fresh(), "Index should be stale after a write for an unknown user"
+
+
+async def test_presence_reloads_in_background(client):
+    """Test a stale index keeps serving its snapshot while one reload runs in the background."""
+    index = PresenceIndex(refresh_seconds=60)
+    index.load(FakeReadSession([(1, "Ann", 0, None)]))
+    index.invalidate()
+
+    # Another request is already reloading: don't wait for it, don't start a second one
+    with index._load_lock:
+        index.ensure_loaded(None)
+        assert [row[1] for row in index.select()] == ["Ann"], "Stale snapshot should still be served"
+
+    # Otherwise start a reload from the database in the background
+    index.ensure_loaded(None)
+    for _ in range(40):
+        if index._is_fresh():
+            break
+        await asyncio.sleep(0.05)
+
+    assert index._is_fresh(), "Background reload should finish"
+    names = {row[1] for row in index.select()}
+    assert "Sam Cooke" in names, f"Background reload should read the database, got {names}"
 
 
 # =============================================================================
 # PATCH /me/status Tests
 # =============================================================================
 
-def test_update_status_authenticated():
+async def test_update_status_authenticated(client):
     """Test PATCH /me/status with valid auth updates status."""
-    token = get_token(**VALID_USER)
-    
+    headers = auth_header("status-writer")
+
     # Update to "Working Remotely" (1)
-    response = requests.patch(
-        f"{BASE_URL}/me/status",
-        json={"status": 1},
-        headers=auth_header(token)
-    )
-    
+    async with measure() as m:
+        response = await client.patch("/me/status", json={"status": 1}, headers=headers)
+
     assert response.status_code == 200, f"Expected 200, got {response.status_code}"
     data = response.json()
     assert data["status"] == "Working Remotely", f"Expected 'Working Remotely', got '{data['status']}'"
-    
+    m.assert_within(BUDGETS["/me/status"], "PATCH /me/status")
+
     # Verify update persisted by checking team list
-    team_response = requests.get(f"{BASE_URL}/team", headers=auth_header(token))
+    team_response = await client.get("/team", headers=headers)
     team = team_response.json()
-    current_user = next((u for u in team if u["full_name"] == "Sam Cooke"), None)
+    current_user = next((u for u in team if u["full_name"] == "Status Writer"), None)
     assert current_user is not None, "Should find current user in team"
     assert current_user["status"] == "Working Remotely", "Status should be updated"
-    print("✅ test_update_status_authenticated passed")
+
+    # Other users see it through the presence index
+    team = (await client.get("/team?status=1", headers=auth_header("otis"))).json()
+    assert "Status Writer" in {u["full_name"] for u in team}, "Update should be visible to others"
 
 
-def test_update_status_unauthenticated():
+async def test_update_status_unauthenticated(client):
     """Test PATCH /me/status without auth returns 401."""
-    response = requests.patch(
-        f"{BASE_URL}/me/status",
-        json={"status": 0}
-    )
-    
+    response = await client.patch("/me/status", json={"status": 0})
+
     assert response.status_code == 401, f"Expected 401, got {response.status_code}"
-    print("✅ test_update_status_unauthenticated passed")
 
 
-def test_update_status_invalid_status():
+async def test_update_status_invalid_status(client):
     """Test PATCH /me/status with invalid status value returns 422."""
-    token = get_token(**VALID_USER)
-    
-    response = requests.patch(
-        f"{BASE_URL}/me/status",
+    response = await client.patch(
+        "/me/status",
         json={"status": 99},  # Invalid status
-        headers=auth_header(token)
+        headers=auth_header("samc")
     )
-    
+
     assert response.status_code == 422, f"Expected 422, got {response.status_code}"
-    print("✅ test_update_status_invalid_status passed")
 
 
-def test_update_status_missing_field():
+async def test_update_status_missing_field(client):
     """Test PATCH /me/status with missing status field returns 422."""
-    token = get_token(**VALID_USER)
-    
-    response = requests.patch(
-        f"{BASE_URL}/me/status",
-        json={},
-        headers=auth_header(token)
-    )
-    
+    response = await client.patch("/me/status", json={}, headers=auth_header("samc"))
+
     assert response.status_code == 422, f"Expected 422, got {response.status_code}"
-    print("✅ test_update_status_missing_field passed")
 
 
-def test_update_status_all_valid_statuses():
+async def test_update_status_all_valid_statuses(client):
     """Test that all valid status values can be set."""
-    token = get_token(**VALID_USER)
-    
+    headers = auth_header("status-cycler")
+
     statuses = [
         (0, "Working"),
         (1, "Working Remotely"),
         (2, "On Vacation"),
         (3, "Business Trip"),
     ]
-    
+
     for status_code, status_label in statuses:
-        response = requests.patch(
-            f"{BASE_URL}/me/status",
-            json={"status": status_code},
-            headers=auth_header(token)
-        )
-        
+        response = await client.patch("/me/status", json={"status": status_code}, headers=headers)
+
         assert response.status_code == 200, \
             f"Failed to set status {status_code}: got {response.status_code}"
         assert response.json()["status"] == status_label, \
             f"Expected '{status_label}', got '{response.json()['status']}'"
-    
+
     # Reset to Working
-    requests.patch(
-        f"{BASE_URL}/me/status",
-        json={"status": 0},
-        headers=auth_header(token)
+    await client.patch("/me/status", json={"status": 0}, headers=headers)
+
+
+# =============================================================================
+# GET /audit Tests
+# =============================================================================
+
+async def test_audit_unauthenticated(client):
+    """Test GET /audit without auth returns 401."""
+    response = await client.get("/audit")
+
+    assert response.status_code == 401, f"Expected 401, got {response.status_code}"
+
+
+async def test_audit_forbidden_for_non_admin(client):
+    """Test GET /audit as a user not in ADMIN_USERNAMES returns 403."""
+    response = await client.get("/audit", headers=auth_header("samc"))
+
+    assert response.status_code == 403, f"Expected 403, got {response.status_code}"
+
+
+async def test_audit_records_login(client):
+    """Test a login shows up in the audit log once the writer flushes."""
+    response = await client.post("/login", json={"username": "admin", "password": "password123"})
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    events = []
+    for _ in range(40):
+        events = (await client.get("/audit?username=admin&event=login", headers=auth_header("admin"))).json()
+        if events:
+            break
+        await asyncio.sleep(0.05)
+
+    assert events, "Login should be recorded in the audit log"
+    assert events[0]["detail"] == {"outcome": "success"}, f"Unexpected detail {events[0]['detail']}"
+    assert events[0]["client_ip"].startswith("10.0.0."), "Audit event should record the client IP"
+
+
+# =============================================================================
+# Segment file audit sink Tests
+# =============================================================================
+
+AUDIT_START = datetime(2024, 1, 1)
+
+
+def make_file_sink(max_segment_bytes: int = 1024) -> SegmentFileAuditSink:
+    """A files sink in a fresh temporary AUDIT_DIR."""
+    return SegmentFileAuditSink(tempfile.mkdtemp(dir=TEST_DIR), max_segment_bytes)
+
+
+def audit_event(minute: int, username: str = "samc", event: str = "login") -> dict:
+    return {
+        "created_at": AUDIT_START + timedelta(minutes=minute),
+        "event": event,
+        "username": username,
+        "client_ip": None,
+        "detail": {"minute": minute},
+    }
+
+
+async def test_audit_files_rotate_segments(client):
+    """Test the files sink starts a new segment once the current one is full."""
+    sink = make_file_sink(max_segment_bytes=300)
+    for minute in range(6):
+        sink.write_batch([audit_event(minute)])
+
+    segments = sink._segments()
+    assert len(segments) >= 3, f"Expected several segments, got {segments}"
+    for name in segments:
+        size = os.path.getsize(os.path.join(sink.directory, name))
+        assert size <= 300, f"{name} is {size} bytes, over the segment limit"
+
+
+async def test_audit_files_newest_first_across_segments(client):
+    """Test queries return events newest first, across segment boundaries."""
+    sink = make_file_sink(max_segment_bytes=300)
+    for minute in range(6):
+        sink.write_batch([audit_event(minute, username="samc" if minute % 2 else "otis")])
+
+    minutes = [record["detail"]["minute"] for record in sink.query()]
+    assert minutes == [5, 4, 3, 2, 1, 0], f"Expected newest first, got {minutes}"
+    minutes = [record["detail"]["minute"] for record in sink.query(username="samc", limit=2)]
+    assert minutes == [5, 3], f"Expected samc's two latest events, got {minutes}"
+
+
+async def test_audit_files_reopen_at_last_segment(client):
+    """Test a reopened sink keeps appending to the last segment."""
+    sink = make_file_sink()
+    sink.write_batch([audit_event(0)])
+
+    reopened = SegmentFileAuditSink(sink.directory, sink.max_segment_bytes)
+    reopened.write_batch([audit_event(1)])
+
+    assert reopened._segments() == ["audit-000001.ndjson"], f"Unexpected segments {reopened._segments()}"
+    minutes = [record["detail"]["minute"] for record in reopened.query()]
+    assert minutes == [1, 0], f"Expected both events, got {minutes}"
+
+
+async def test_audit_files_ignore_partial_last_line(client):
+    """Test a partly written last line is skipped, and a reopened sink starts a new segment after it."""
+    sink = make_file_sink()
+    sink.write_batch([audit_event(0)])
+    with open(sink._path(1), "ab") as segment:
+        segment.write(b'{"created_at": "2024-01-01T00:01:00", "event": "login", "username": "samc"')
+
+    assert len(sink.query()) == 1, "Full scan should skip the partial line"
+    assert len(sink.query(username="samc")) == 1, "Username scan should skip the partial line"
+
+    reopened = SegmentFileAuditSink(sink.directory, sink.max_segment_bytes)
+    reopened.write_batch([audit_event(2)])
+    minutes = [record["detail"]["minute"] for record in reopened.query()]
+    assert minutes == [2, 0], f"Expected the events on either side of the partial line, got {minutes}"
+
+
+async def test_audit_files_since_skips_older_segments(client):
+    """Test a `since` query stops at the first segment reaching past it."""
+    sink = make_file_sink(max_segment_bytes=300)
+    for minute in range(6):
+        sink.write_batch([audit_event(minute)])
+
+    read = []
+    read_lines = sink._read_lines
+    sink._read_lines = lambda path, needle: read.append(os.path.basename(path)) or read_lines(path, needle)
+
+    minutes = [record["detail"]["minute"] for record in sink.query(since=AUDIT_START + timedelta(minutes=4))]
+    assert minutes == [5, 4], f"Expected events from minute 4 on, got {minutes}"
+    assert len(read) < len(sink._segments()), f"Read every segment: {read}"
+
+
+# =============================================================================
+# POST /ingest/statuses Tests
+# =============================================================================
+
+async def test_ingest_forbidden_for_non_admin(client):
+    """Test POST /ingest/statuses as a user not in ADMIN_USERNAMES returns 403."""
+    response = await client.post(
+        "/ingest/statuses?format=csv",
+        content="username,status\nsamc,0\n",
+        headers=auth_header("samc")
+    )
+
+    assert response.status_code == 403, f"Expected 403, got {response.status_code}"
+
+
+async def test_ingest_csv_applies_changes(client):
+    """Test a CSV feed only writes real changes and reports unknown users."""
+    response = await client.post(
+        "/ingest/statuses?format=csv",
+        content="username,status\ningest-target,On Vacation\nstranger,1\ningest-target,ON_VACATION\n",
+        headers=auth_header("admin")
     )
-    print("✅ test_update_status_all_valid_statuses passed")
+
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    report = response.json()
+    assert report["changed"] == 1, f"Expected 1 change, got {report['changed']}"
+    assert report["unchanged"] == 1, f"Expected 1 unchanged row, got {report['unchanged']}"
+    assert report["unknown_users"] == 1, f"Expected 1 unknown user, got {report['unknown_users']}"
+
+    team = (await client.get("/team?status=2", headers=auth_header("otis"))).json()
+    assert "Ingest Target" in {u["full_name"] for u in team}, "Ingested status should be visible"
+
+
+async def test_ingest_csv_counts_every_row(client):
+    """Test a status changed and changed back within a chunk is still counted."""
+    response = await client.post(
+        "/ingest/statuses?format=csv",
+        content="username,status\ningest-flipper,2\ningest-flipper,0\ningest-flipper,3\ningest-flipper,1\n",
+        headers=auth_header("admin")
+    )
+
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    report = response.json()
+    assert report["changed"] == 1, f"Expected 1 change, got {report['changed']}"
+    counted = report["changed"] + report["unchanged"] + report["unknown_users"] + report["invalid_rows"]
+    assert counted == report["rows"] == 4, f"Every row should be counted once: {report}"
+
+
+ICS_FEED = (
+    "BEGIN:VCALENDAR\r\n"
+    # All-day event, upper-case MAILTO: and a folded ATTENDEE line
+    "BEGIN:VEVENT\r\n"
+    "DTSTART;VALUE=DATE:20240601\r\n"
+    "DTEND;VALUE=DATE:20240603\r\n"
+    "ATTENDEE;CN=Sam Cooke:MAILTO:SamC@exam\r\n"
+    " ple.com\r\n"
+    "CATEGORIES:Vacation\r\n"
+    "END:VEVENT\r\n"
+    # Malformed date
+    "BEGIN:VEVENT\r\n"
+    "DTSTART:20240601T000000Z\r\n"
+    "DTEND:2099-01-01\r\n"
+    "ATTENDEE:mailto:otis@example.com\r\n"
+    "CATEGORIES:Travel\r\n"
+    "END:VEVENT\r\n"
+    # Folded CATEGORIES, already over
+    "BEGIN:VEVENT\r\n"
+    "DTSTART:20240501T090000Z\r\n"
+    "DTEND:20240501T170000Z\r\n"
+    "ATTENDEE:mailto:gknight@example.com\r\n"
+    "CATEGORIES:Business\r\n"
+    "\t Trip\r\n"
+    "END:VEVENT\r\n"
+    # Date-time event with a folded CATEGORIES line, active
+    "BEGIN:VEVENT\r\n"
+    "DTSTART:20240601T090000Z\r\n"
+    "DTEND:20240601T170000Z\r\n"
+    "ATTENDEE:mailto:afranklin@example.com\r\n"
+    "CATEGORIES:Business\r\n"
+    "  Trip\r\n"
+    "END:VEVENT\r\n"
+    # All-day event without DTEND lasts one day, so it is over
+    "BEGIN:VEVENT\r\n"
+    "DTSTART;VALUE=DATE:20240531\r\n"
+    "ATTENDEE:mailto:kingluther@example.com\r\n"
+    "CATEGORIES:Vacation\r\n"
+    "END:VEVENT\r\n"
+    # ... and is active on its day
+    "BEGIN:VEVENT\r\n"
+    "DTSTART;VALUE=DATE:20240601\r\n"
+    "ATTENDEE:mailto:dee@example.com\r\n"
+    "CATEGORIES:Vacation\r\n"
+    "END:VEVENT\r\n"
+    # DURATION instead of DTEND, active
+    "BEGIN:VEVENT\r\n"
+    "DTSTART:20240601T080000Z\r\n"
+    "DURATION:PT8H\r\n"
+    "ATTENDEE:mailto:ann@example.com\r\n"
+    "CATEGORIES:Travel\r\n"
+    "END:VEVENT\r\n"
+    # DURATION instead of DTEND, over; samc has an active event, so isn't reset
+    "BEGIN:VEVENT\r\n"
+    "DTSTART:20240531T080000Z\r\n"
+    "DURATION:PT8H\r\n"
+    "ATTENDEE:mailto:bob@example.com\r\n"
+    "ATTENDEE:mailto:samc@example.com\r\n"
+    "CATEGORIES:Travel\r\n"
+    "END:VEVENT\r\n"
+    # DATE-TIME start without DTEND or DURATION takes no time
+    "BEGIN:VEVENT\r\n"
+    "DTSTART:20240601T110000Z\r\n"
+    "ATTENDEE:mailto:cid@example.com\r\n"
+    "CATEGORIES:Remote\r\n"
+    "END:VEVENT\r\n"
+    "END:VCALENDAR\r\n"
+)
+
+
+async def test_parse_ics_feed(client):
+    """Test ICS parsing of folded lines, DATE values, MAILTO:, DURATION, default ends and malformed dates."""
+    rows = list(parse_ics(io.StringIO(ICS_FEED), now=datetime(2024, 6, 1, 12)))
+
+    assert rows == [
+        ("samc", StatusEnum.ON_VACATION),
+        ("otis", None),
+        ("afranklin", StatusEnum.BUSINESS_TRIP),
+        ("dee", StatusEnum.ON_VACATION),
+        ("ann", StatusEnum.BUSINESS_TRIP),
+        # Attendees of ended events go back to working
+        ("bob", StatusEnum.WORKING),
+        ("cid", StatusEnum.WORKING),
+        ("gknight", StatusEnum.WORKING),
+        ("kingluther", StatusEnum.WORKING),
+    ], f"Unexpected rows {rows}"
+
+    # Long after the feed, nobody is active any more
+    rows = dict(parse_ics(io.StringIO(ICS_FEED), now=datetime(2026, 10, 19)))
+    assert rows.pop("otis") is None, "Malformed event should stay invalid"
+    assert set(rows.values()) == {StatusEnum.WORKING}, f"Ended events should not set a status: {rows}"
+
+
+async def test_parse_csv_skips_malformed_rows(client):
+    """Test a malformed CSV row is reported as invalid without stopping the feed."""
+    feed = 'username,status\nsamc,1\n"' + "x" * 200000 + '",2\notis,3\n'
+    rows = list(parse_csv(io.StringIO(feed)))
+
+    assert rows == [
+        ("samc", StatusEnum.WORKING_REMOTELY),
+        ("", None),
+        ("otis", StatusEnum.BUSINESS_TRIP),
+    ], f"Unexpected rows {rows}"
+
+
+async def test_ingest_ics_counts_malformed_events(client):
+    """Test an ICS feed with a malformed event still applies the valid ones."""
+    feed = (
+        "BEGIN:VCALENDAR\r\n"
+        "BEGIN:VEVENT\r\n"
+        "DTSTART:20000101T000000Z\r\n"
+        "DTEND:not-a-date\r\n"
+        "ATTENDEE:mailto:samc@example.com\r\n"
+        "CATEGORIES:Vacation\r\n"
+        "END:VEVENT\r\n"
+        "BEGIN:VEVENT\r\n"
+        "DTSTART;VALUE=DATE:20000101\r\n"
+        "DTEND;VALUE=DATE:20990101\r\n"
+        "ATTENDEE:MAILTO:ics-target@example.com\r\n"
+        "CATEGORIES:Remote\r\n"
+        "END:VEVENT\r\n"
+        "END:VCALENDAR\r\n"
+    )
+    response = await client.post("/ingest/statuses?format=ics", content=feed, headers=auth_header("admin"))
+
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    report = response.json()
+    assert report["invalid_rows"] == 1, f"Expected 1 invalid row, got {report['invalid_rows']}"
+    assert report["changed"] == 1, f"Expected 1 change, got {report['changed']}"
+
+    team = (await client.get("/team?status=1", headers=auth_header("otis"))).json()
+    assert "Ics Target" in {u["full_name"] for u in team}, "Valid event should still be applied"
 
 
 # =============================================================================
 # Run All Tests
 # =============================================================================
 
-def run_all_tests():
-    """Run all test functions."""
-    tests = [
-        # Health
-        test_health_check,
-        # Auth
-        test_login_success,
-        test_login_wrong_password,
-        test_login_nonexistent_user,
-        test_login_missing_fields,
-        # GET /team
-        test_get_team_authenticated,
-        test_get_team_unauthenticated,
-        test_get_team_invalid_token,
-        test_get_team_filter_single_status,
-        test_get_team_filter_multiple_statuses,
-        test_get_team_filter_no_results,
-        # PATCH /me/status
-        test_update_status_authenticated,
-        test_update_status_unauthenticated,
-        test_update_status_invalid_status,
-        test_update_status_missing_field,
-        test_update_status_all_valid_statuses,
-    ]
-    
+TESTS = [
+    # Health
+    test_health_check,
+    # Auth
+    test_login_success,
+    test_login_wrong_password,
+    test_login_nonexistent_user,
+    test_login_missing_fields,
+    test_login_throttled,
+    test_login_throttle_spares_other_bucket,
+    test_limiter_refund,
+    # GET /team
+    test_get_team_authenticated,
+    test_get_team_unauthenticated,
+    test_get_team_invalid_token,
+    test_get_team_filter_single_status,
+    test_get_team_filter_multiple_statuses,
+    test_get_team_filter_no_results,
+    test_get_team_counts,
+    test_team_reads_use_read_engine,
+    test_sticky_caller_reads_from_writer,
+    # Presence index
+    test_presence_replays_writes_during_load,
+    test_presence_reloads_in_background,
+    # PATCH /me/status
+    test_update_status_authenticated,
+    test_update_status_unauthenticated,
+    test_update_status_invalid_status,
+    test_update_status_missing_field,
+    test_update_status_all_valid_statuses,
+    # GET /audit
+    test_audit_unauthenticated,
+    test_audit_forbidden_for_non_admin,
+    test_audit_records_login,
+    # Segment file audit sink
+    test_audit_files_rotate_segments,
+    test_audit_files_newest_first_across_segments,
+    test_audit_files_reopen_at_last_segment,
+    test_audit_files_ignore_partial_last_line,
+    test_audit_files_since_skips_older_segments,
+    # POST /ingest/statuses
+    test_ingest_forbidden_for_non_admin,
+    test_ingest_csv_applies_changes,
+    test_ingest_csv_counts_every_row,
+    test_parse_ics_feed,
+    test_parse_csv_skips_malformed_rows,
+    test_ingest_ics_counts_malformed_events,
+]
+
+
+async def run_test(index: int, test) -> Optional[str]:
+    """Run one test with its own client; returns an error message on failure."""
+    async with make_client(f"10.0.0.{index + 1}") as client:
+        try:
+            await test(client)
+        except AssertionError as e:
+            return f"FAILED: {e}"
+        except Exception as e:
+            return f"FAILED with unexpected error: {e!r}"
+    return None
+
+
+async def run_all_tests() -> bool:
+    """Start the app, load fixtures and run all tests concurrently."""
     print("=" * 60)
     print("Running Team Presence Dashboard API Tests")
     print("=" * 60)
     print()
-    
-    passed = 0
-    failed = 0
-    
-    for test in tests:
-        try:
-            test()
-            passed += 1
-        except AssertionError as e:
-            print(f"❌ {test.__name__} FAILED: {e}")
-            failed += 1
-        except requests.exceptions.ConnectionError:
-            print(f"❌ {test.__name__} FAILED: Could not connect to server")
-            print("   Make sure the server is running on localhost:8000")
-            failed += 1
-        except Exception as e:
-            print(f"❌ {test.__name__} FAILED with unexpected error: {e}")
-            failed += 1
-    
+
+    started = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        setup_fixtures()
+        results = await asyncio.gather(*(run_test(i, test) for i, test in enumerate(TESTS)))
+    elapsed = time.perf_counter() - started
+
+    for test, error in zip(TESTS, results):
+        if error is None:
+            print(f"✅ {test.__name__} passed")
+        else:
+            print(f"❌ {test.__name__} {error}")
+
+    failed = sum(error is not None for error in results)
     print()
     print("=" * 60)
-    print(f"Results: {passed} passed, {failed} failed")
+    print(f"Results: {len(TESTS) - failed} passed, {failed} failed ({elapsed:.2f}s)")
     print("=" * 60)
-    
+
     return failed == 0
 
 
 if __name__ == "__main__":
-    success = run_all_tests()
+    try:
+        success = asyncio.run(run_all_tests())
+    finally:
+        write_engine.dispose()
+        read_engine.dispose()
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
     sys.exit(0 if success else 1)
-